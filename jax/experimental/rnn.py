@@ -82,8 +82,9 @@ TODO:
   - Support ragged inputs.
   - Support RNNs other than LSTM.
 """
-from functools import partial
-from typing import Any, Dict, List, Tuple
+from functools import lru_cache, partial
+import math
+from typing import Any, NamedTuple, Optional, Tuple
 
 import jax
 import numpy as np
@@ -91,8 +92,7 @@ from jax._src import core
 from jax.interpreters import mlir
 from jax.interpreters import xla
 from jax._src.custom_derivatives import custom_vjp
-from jax._src.typing import Array, Shape
-from jax._src.util import prod
+from jax._src.typing import Array, DTypeLike, Shape
 import jax.numpy as jnp
 try:
   from jax._src.lib import gpu_rnn
@@ -104,64 +104,38 @@ sigmoid = jax.nn.sigmoid
 tanh = jax.nn.tanh
 
 
-def _W_ih_l(layer_i: int, input_size: int, hidden_size: int,
-            bidirectional: bool) -> Shape:
-  """Shape of W_ii|W_if|W_ig|W_io.
-
-  Note that layer_i is an index of pseudo-layers.
-  """
-  if layer_i == 0 or (layer_i == 1 and bidirectional):
-    return (4 * hidden_size, input_size)
-  else:
-    num_directions = 2 if bidirectional else 1
-    return (4 * hidden_size, num_directions * hidden_size)
-
-
-def _W_hh_l(layer_i: int, input_size: int, hidden_size: int,
-            bidirectional: bool) -> Shape:
-  """Shape of W_hi|W_hf|W_hg|W_ho."""
-  return (4 * hidden_size, hidden_size)
-
-
-def _b_ih_l(layer_i: int, input_size: int, hidden_size: int,
-            bidirectional: bool) -> Shape:
-  """Shape of b_ii|b_if|b_ig|b_io."""
-  return (4 * hidden_size,)
-
-
-def _b_hh_l(layer_i: int, input_size: int, hidden_size: int,
-            bidirectional: bool) -> Shape:
-  """Shape of b_hi|b_hf|b_hg|b_ho."""
-  return (4 * hidden_size,)
-
-
+@lru_cache(maxsize=None)
 def _get_params_shapes_in_lstm(input_size: int, hidden_size: int,
                                num_layers: int,
-                               bidirectional: bool) -> List[Shape]:
+                               bidirectional: bool) -> Tuple[Shape, ...]:
   """Get flat param shapes in LSTM. See module docstring for layout."""
-  layer_shapes = []
   num_directions = 2 if bidirectional else 1
   num_pseudo_layers = num_layers * num_directions
-  linear_weights = [_W_ih_l, _W_hh_l]
-  for i in range(num_pseudo_layers):
-    for w_kind in linear_weights:
-      layer_shape = w_kind(i, input_size, hidden_size, bidirectional)
-      layer_shapes.append(layer_shape)
-
-  bias_weights = [_b_ih_l, _b_hh_l]
-  for i in range(num_pseudo_layers):
-    for w_kind in bias_weights:
-      layer_shape = w_kind(i, input_size, hidden_size, bidirectional)
-      layer_shapes.append(layer_shape)
-  return layer_shapes
-
-
+  # W_ii|W_if|W_ig|W_io of the first layer take input_size features, and those
+  # of later layers take the concat'ed outputs of all directions.
+  W_ih_shapes = (
+      [(4 * hidden_size, input_size)] * num_directions +
+      [(4 * hidden_size, num_directions * hidden_size)] *
+      (num_pseudo_layers - num_directions))
+  # W_hi|W_hf|W_hg|W_ho
+  W_hh_shape = (4 * hidden_size, hidden_size)
+  # b_ii|b_if|b_ig|b_io and b_hi|b_hf|b_hg|b_ho
+  b_shape = (4 * hidden_size,)
+
+  linear_shapes = []
+  for W_ih_shape in W_ih_shapes:
+    linear_shapes += [W_ih_shape, W_hh_shape]
+  bias_shapes = [b_shape] * (2 * num_pseudo_layers)
+  return tuple(linear_shapes + bias_shapes)
+
+
+@lru_cache(maxsize=None)
 def get_num_params_in_lstm(input_size: int, hidden_size: int, num_layers: int,
                            bidirectional: bool) -> int:
   """Get param count in LSTM."""
   layer_shapes = _get_params_shapes_in_lstm(input_size, hidden_size, num_layers,
                                             bidirectional)
-  param_count = sum([prod(shape) for shape in layer_shapes])
+  param_count = sum(math.prod(shape) for shape in layer_shapes)
   return param_count
 
 
@@ -175,46 +149,129 @@ def init_lstm_weight(rng: PRNGKeyArray, input_size: int, hidden_size: int,
       rng, shape=(param_count,), dtype=jnp.float32, minval=-k, maxval=k)
 
 
-def unpack_lstm_weights(
-    weights: Array, input_size: int, hidden_size: int, num_layers: int,
-    bidirectional: bool
-) -> Tuple[Dict[int, Array], Dict[int, Array], Dict[int, Array], Dict[int,
-                                                                      Array]]:
-  """Unpack cudnn LSTM weights into individual weights.
+class LSTMWeights(NamedTuple):
+  """LSTM weights stacked by pseudo-layer.
+
+  The first layer's W_ih takes input_size features while every later layer's
+  takes num_directions * hidden_size, so W_ih is split into two stacks.
+
+  W_ih_first: (num_directions, 4 * hidden_size, input_size)
+  W_ih_rest: (num_pseudo_layers - num_directions, 4 * hidden_size,
+    num_directions * hidden_size)
+  W_hh: (num_pseudo_layers, 4 * hidden_size, hidden_size)
+  b_ih: (num_pseudo_layers, 4 * hidden_size)
+  b_hh: (num_pseudo_layers, 4 * hidden_size)
+  """
+  W_ih_first: Array
+  W_ih_rest: Array
+  W_hh: Array
+  b_ih: Array
+  b_hh: Array
+
+
+def unpack_lstm_weights(weights: Array, input_size: int, hidden_size: int,
+                        num_layers: int, bidirectional: bool) -> LSTMWeights:
+  """Unpack cudnn LSTM weights into stacked weights.
 
   CUDNN LSTM weight layout: (num_layers, num_directions, W_ih, W_hh, b_ih, b_hh)
-  Returns W_ih, W_hh, b_ih, b_hh. e.g. W_ih[2][1] is the concat weights of
-  4 weights (W_ii, W_if, W_ig, W_io), each of shape (hidden_size, input_size)
-  at 2nd layer for the reverse direction. See notations from
-  https://pytorch.org/docs/stable/generated/torch.nn.LSTM.html#torch.nn.LSTM.
+  Pseudo-layer p = layer * num_directions + direction. Every row of a stack is
+  the concat of the 4 gate weights (i, f, g, o) of one pseudo-layer:
+  W_ih_first[d] is (W_ii, W_if, W_ig, W_io) of the 1st layer in direction d,
+  W_ih_rest[p - num_directions] is (W_ii, W_if, W_ig, W_io) of every later
+  pseudo-layer p, W_hh[p] is (W_hi, W_hf, W_hg, W_ho) and likewise for b_ih[p]
+  and b_hh[p]. E.g. for a bidirectional LSTM, W_ih_rest[1] and W_hh[3] are
+  the weights of the 2nd layer in the reverse direction. See `LSTMWeights`
+  for shapes and notations from
+  https://pytorch.org/docs/stable/generated/torch.nn.LSTM.html.
   """
   flat_shapes = _get_params_shapes_in_lstm(input_size, hidden_size, num_layers,
                                            bidirectional)
-  flat_shapes_offset = 0
-  w_offsets = 0
   num_directions = 2 if bidirectional else 1
   num_pseudo_layers = num_layers * num_directions
-
-  W_ih: Dict[int, Array] = {}
-  W_hh: Dict[int, Array] = {}
-  for l in range(num_pseudo_layers):
-    for w_kind in [W_ih, W_hh]:
-      shape = flat_shapes[flat_shapes_offset]
-      flat_shapes_offset += 1
-      num_elems = prod(shape)
-      w_kind[l] = weights[w_offsets:w_offsets + num_elems].reshape(shape)
-      w_offsets += num_elems
-
-  b_ih: Dict[int, Array] = {}
-  b_hh: Dict[int, Array] = {}
-  for l in range(num_pseudo_layers):
-    for w_kind in [b_ih, b_hh]:
-      shape = flat_shapes[flat_shapes_offset]
-      flat_shapes_offset += 1
-      num_elems = prod(shape)
-      w_kind[l] = weights[w_offsets:w_offsets + num_elems].reshape(shape)
-      w_offsets += num_elems
-  return W_ih, W_hh, b_ih, b_hh
+  num_rest = num_pseudo_layers - num_directions
+  # Static offsets of every param in the flat weights.
+  offsets = np.cumsum([0] + [math.prod(shape) for shape in flat_shapes])
+
+  # Linear weights come first, as a (W_ih, W_hh) pair per pseudo-layer.
+  def flat_param(i):
+    return weights[offsets[i]:offsets[i + 1]].reshape(flat_shapes[i])
+
+  W_ih_first = jnp.stack([flat_param(2 * l) for l in range(num_directions)])
+  W_hh_first = jnp.stack(
+      [flat_param(2 * l + 1) for l in range(num_directions)])
+
+  # Pairs of the remaining pseudo-layers all have the same shapes, so they are
+  # read as a single dense block.
+  W_ih_rest_shape = (4 * hidden_size, num_directions * hidden_size)
+  W_hh_shape = (4 * hidden_size, hidden_size)
+  rest = weights[offsets[2 * num_directions]:offsets[2 * num_pseudo_layers]]
+  rest = rest.reshape(num_rest,
+                      math.prod(W_ih_rest_shape) + math.prod(W_hh_shape))
+  W_ih_rest = rest[:, :math.prod(W_ih_rest_shape)].reshape(
+      num_rest, *W_ih_rest_shape)
+  W_hh_rest = rest[:, math.prod(W_ih_rest_shape):].reshape(
+      num_rest, *W_hh_shape)
+
+  # Biases all have the same shape, so they are read as a single dense
+  # (num_pseudo_layers, 2, 4 * hidden_size) block of (b_ih, b_hh) pairs.
+  b = weights[offsets[2 * num_pseudo_layers]:].reshape(
+      num_pseudo_layers, 2, 4 * hidden_size)
+  return LSTMWeights(
+      W_ih_first=W_ih_first,
+      W_ih_rest=W_ih_rest,
+      W_hh=jnp.concatenate([W_hh_first, W_hh_rest]),
+      b_ih=b[:, 0],
+      b_hh=b[:, 1])
+
+
+def pack_lstm_weights(weights: LSTMWeights) -> Array:
+  """Pack stacked LSTM weights into the flat cudnn layout.
+
+  Inverse of `unpack_lstm_weights`; the result can be passed to `lstm`.
+  """
+  num_directions = weights.W_ih_first.shape[0]
+
+  def per_pseudo_layer(w):
+    return w.reshape(w.shape[0], math.prod(w.shape[1:]))
+
+  # (W_ih, W_hh) pairs of all pseudo-layers, followed by (b_ih, b_hh) pairs.
+  first = jnp.concatenate([
+      per_pseudo_layer(weights.W_ih_first),
+      per_pseudo_layer(weights.W_hh[:num_directions])
+  ], axis=1)
+  rest = jnp.concatenate([
+      per_pseudo_layer(weights.W_ih_rest),
+      per_pseudo_layer(weights.W_hh[num_directions:])
+  ], axis=1)
+  b = jnp.stack([weights.b_ih, weights.b_hh], axis=1)
+  return jnp.concatenate([first.ravel(), rest.ravel(), b.ravel()])
+
+
+@partial(jax.jit, static_argnums=(1, 2, 3, 4))
+def init_lstm_weight_unpacked(rng: PRNGKeyArray, input_size: int,
+                              hidden_size: int, num_layers: int,
+                              bidirectional: bool) -> LSTMWeights:
+  """Random initialize stacked LSTM weights from U(-k, k).
+
+  k = sqrt(1/hidden_size). Unlike `init_lstm_weight`, each stack is drawn
+  directly in its own shape from its own key, without materializing the flat
+  cudnn weights. The values therefore differ from those of `init_lstm_weight`
+  for the same rng. Use `pack_lstm_weights` to pass the result to `lstm`.
+  """
+  num_directions = 2 if bidirectional else 1
+  num_pseudo_layers = num_layers * num_directions
+  k = np.sqrt(1.0 / hidden_size)
+  uniform = partial(jax.random.uniform, dtype=jnp.float32, minval=-k, maxval=k)
+  keys = jax.random.split(rng, len(LSTMWeights._fields))
+  return LSTMWeights(
+      W_ih_first=uniform(keys[0],
+                         (num_directions, 4 * hidden_size, input_size)),
+      W_ih_rest=uniform(keys[1],
+                        (num_pseudo_layers - num_directions, 4 * hidden_size,
+                         num_directions * hidden_size)),
+      W_hh=uniform(keys[2], (num_pseudo_layers, 4 * hidden_size, hidden_size)),
+      b_ih=uniform(keys[3], (num_pseudo_layers, 4 * hidden_size)),
+      b_hh=uniform(keys[4], (num_pseudo_layers, 4 * hidden_size)))
 
 
 @partial(custom_vjp, nondiff_argnums=(5, 6, 7, 8, 9))
@@ -250,16 +307,39 @@ def lstm(x: Array, h_0: Array, c_0: Array, weights: Array, seq_lengths: Array,
   return y, h_n, c_n
 
 
-@partial(jax.jit, static_argnums=(8, 9, 10, 11, 12))
-def lstm_ref(x: Array, h_0: Array, c_0: Array, W_ih: Dict[int, Array],
-             W_hh: Dict[int, Array], b_ih: Dict[int, Array],
-             b_hh: Dict[int, Array], seq_lengths: Array, input_size: int,
-             hidden_size: int, num_layers: int, dropout: float,
-             bidirectional: bool) -> Tuple[Array, Array, Array]:
+def _lstm_cell_activation(preact: Array, c: Array) -> Tuple[Array, Array]:
+  """Pointwise tail of an LSTM cell.
+
+  Takes the (..., 4 * hidden_size) gate preactivations and the previous cell
+  state, and returns the new (c, h). This is the point where a fused kernel
+  for the gate activations can be swapped in without touching lstm_ref.
+  """
+  hidden_size = c.shape[-1]
+  i = sigmoid(preact[..., :hidden_size])
+  f = sigmoid(preact[..., hidden_size:2 * hidden_size])
+  g = tanh(preact[..., 2 * hidden_size:3 * hidden_size])
+  o = sigmoid(preact[..., 3 * hidden_size:])
+  c = f * c + i * g
+  h = o * tanh(c)
+  return c, h
+
+
+@partial(
+    jax.jit,
+    static_argnames=('input_size', 'hidden_size', 'num_layers', 'dropout',
+                     'bidirectional', 'compute_dtype'))
+def lstm_ref(x: Array, h_0: Array, c_0: Array, weights: LSTMWeights,
+             seq_lengths: Array, input_size: int, hidden_size: int,
+             num_layers: int, dropout: float, bidirectional: bool,
+             compute_dtype: Optional[DTypeLike] = None
+             ) -> Tuple[Array, Array, Array]:
   """Reference implementation of LSTM.
 
   See https://pytorch.org/docs/stable/generated/torch.nn.LSTM.html#lstm
   https://docs.nvidia.com/deeplearning/cudnn/api/index.html#cudnnRNNMode_t
+
+  If compute_dtype is given (e.g. jnp.bfloat16), the GEMM operands are cast to
+  it while biases, h and c stay in the dtype of x.
   """
   if dropout != 0.0:
     raise NotImplementedError(
@@ -273,54 +353,92 @@ def lstm_ref(x: Array, h_0: Array, c_0: Array, W_ih: Dict[int, Array],
   #   if int(seq_lengths[i]) != max_seq_length:
   #     raise NotImplementedError('Does not yet support ragged sequences.')
 
-  def lstm_cell(carry, x, *, W_ih, W_hh, b_ih, b_hh):
+  def lstm_cell(carry, x_proj, *, W_hhT):
     h, c = carry
-    W_ii, W_if, W_ig, W_io = jnp.split(W_ih, 4, axis=0)
-    W_hi, W_hf, W_hg, W_ho = jnp.split(W_hh, 4, axis=0)
-    b_ii, b_if, b_ig, b_io = jnp.split(b_ih, 4, axis=0)
-    b_hi, b_hf, b_hg, b_ho = jnp.split(b_hh, 4, axis=0)
-    i = sigmoid(x @ W_ii.T + b_ii[None] + h @ W_hi.T + b_hi[None])
-    f = sigmoid(x @ W_if.T + b_if[None] + h @ W_hf.T + b_hf[None])
-    g = tanh(x @ W_ig.T + b_ig[None] + h @ W_hg.T + b_hg[None])
-    o = sigmoid(x @ W_io.T + b_io[None] + h @ W_ho.T + b_ho[None])
-    c = f * c + i * g
-    h = o * tanh(c)
+    h_proj = (h.astype(compute_dtype) @ W_hhT).astype(dtype)
+    c, h = _lstm_cell_activation(x_proj + h_proj, c)
     return (h, c), h
 
-  seq_first_y = x.transpose(1, 0, 2)
-  if not bidirectional:
-    final_h = []
-    final_c = []
-    for l in range(num_layers):
-      cell = partial(
-          lstm_cell, W_ih=W_ih[l], W_hh=W_hh[l], b_ih=b_ih[l], b_hh=b_hh[l])
-      (h_t, c_t), seq_first_y = jax.lax.scan(cell, (h_0[l], c_0[l]),
-                                             seq_first_y)
-      final_h.append(h_t)
-      final_c.append(c_t)
-    h_n = jnp.stack(final_h)
-    c_n = jnp.stack(final_c)
-    return seq_first_y.transpose(1, 0, 2), h_n, c_n
-
-  # bidirectional
-  final_h = []
-  final_c = []
-  for l in range(num_layers * 2):
-    cell = partial(
-        lstm_cell, W_ih=W_ih[l], W_hh=W_hh[l], b_ih=b_ih[l], b_hh=b_hh[l])
-    if l % 2 == 0:
-      (h_t, c_t), seq_first_y_fwd = jax.lax.scan(cell, (h_0[l], c_0[l]),
-                                                 seq_first_y)
-    else:
-      (h_t, c_t), seq_first_y_bwd = jax.lax.scan(
-          cell, (h_0[l], c_0[l]), seq_first_y, reverse=True)
-      # Inputs to next layer are concat'ed from fwd and bwd.
-      seq_first_y = jnp.concatenate([seq_first_y_fwd, seq_first_y_bwd], axis=-1)  # pytype: disable=name-error
-    final_h.append(h_t)
-    final_c.append(c_t)
-  h_n = jnp.stack(final_h)
-  c_n = jnp.stack(final_c)
-  return seq_first_y.transpose(1, 0, 2), h_n, c_n
+  def flip_reverse(seq_first_y):
+    # Flips the reverse direction of a (T, num_directions, ...) array in time.
+    if not bidirectional:
+      return seq_first_y
+    return jnp.stack([seq_first_y[:, 0], jnp.flip(seq_first_y[:, 1], 0)],
+                     axis=1)
+
+  def lstm_layer(x, h_0, c_0, W_ih, W_hhT, b, x_proj_spec):
+    # Weights and initial states carry a leading num_directions axis, and both
+    # directions of a layer run in the same scan. The reverse direction sees
+    # its inputs flipped in time and its outputs are flipped back.
+    #
+    # The inputs of a layer are known for all timesteps before its scan, so the
+    # input GEMMs of every step are done as a single (T * B, I) x (I, 4H) GEMM.
+    # The result is always seq-first; a batch-first x is transposed as part of
+    # the GEMM rather than by a separate copy.
+    x_proj = jnp.einsum(f'{x_proj_spec}->tdbh', x.astype(compute_dtype), W_ih)
+    x_proj = flip_reverse(x_proj.astype(dtype) + b[None, :, None])
+    # Rematerialize the cell on the backward pass so that only its inputs
+    # (h, c and x_proj) are saved per timestep rather than the
+    # (B, 4 * hidden_size) gates and their activations.
+    cell = jax.checkpoint(partial(lstm_cell, W_hhT=W_hhT), prevent_cse=False)
+    (h_t, c_t), seq_first_y = jax.lax.scan(cell, (h_0, c_0), x_proj)
+    # (T, num_directions, B, H) outputs of all directions.
+    return flip_reverse(seq_first_y), h_t, c_t
+
+  num_directions = 2 if bidirectional else 1
+  batch_size = x.shape[0]
+  dtype = x.dtype
+  if compute_dtype is None:
+    compute_dtype = dtype
+  # Cast the GEMM weights once, outside of any scan.
+  W_ih_first = weights.W_ih_first.astype(compute_dtype)
+  W_ih_rest = weights.W_ih_rest.astype(compute_dtype)
+  W_hhT = weights.W_hh.astype(compute_dtype).swapaxes(-1, -2)
+  # b_ih and b_hh are always added together, so sum them once and fold the
+  # result into the input projection instead of adding b_hh every timestep.
+  b = weights.b_ih + weights.b_hh
+
+  # The first layer takes batch-first input_size features and is run on its
+  # own.
+  seq_first_y, h_t, c_t = lstm_layer(
+      x, h_0[:num_directions], c_0[:num_directions], W_ih_first,
+      W_hhT[:num_directions], b[:num_directions], x_proj_spec='bti,dhi')
+
+  if num_layers == 1:
+    # Common single-layer case: the first layer's states are the final states.
+    h_n, c_n = h_t, c_t
+  else:
+    # Final states of all pseudo-layers are written into preallocated buffers.
+    h_n = jnp.zeros_like(h_0).at[:num_directions].set(h_t)
+    c_n = jnp.zeros_like(c_0).at[:num_directions].set(c_t)
+
+    # The remaining layers all have the same shapes, so scan over layers
+    # instead of unrolling one scan per layer.
+    def per_layer(w):
+      return w.reshape(num_layers - 1, num_directions, *w.shape[1:])
+
+    def layer_step(seq_first_x, layer_args):
+      # Later layers read the fwd and bwd outputs of the previous layer as
+      # they are instead of concat'ing them; W_ih is split by the direction
+      # of its input features and the projection sums over both.
+      seq_first_y, h_t, c_t = lstm_layer(
+          seq_first_x, *layer_args, x_proj_spec='tebi,dhei')
+      return seq_first_y, (h_t, c_t)
+
+    state_shape = (num_layers - 1, num_directions, batch_size, hidden_size)
+    seq_first_y, (h_rest, c_rest) = jax.lax.scan(
+        layer_step, seq_first_y,
+        (h_0[num_directions:].reshape(state_shape),
+         c_0[num_directions:].reshape(state_shape),
+         per_layer(W_ih_rest.reshape(*W_ih_rest.shape[:2], num_directions,
+                                     hidden_size)),
+         per_layer(W_hhT[num_directions:]), per_layer(b[num_directions:])))
+    h_n = h_n.at[num_directions:].set(h_rest.reshape(-1, *h_n.shape[1:]))
+    c_n = c_n.at[num_directions:].set(c_rest.reshape(-1, *c_n.shape[1:]))
+  # Outputs are concat'ed from fwd and bwd.
+  y = seq_first_y.transpose(2, 0, 1, 3).reshape(
+      batch_size, seq_first_y.shape[0], num_directions * hidden_size)
+  return y, h_n, c_n
 
 
 def lstm_fwd(x: Array, h_0: Array, c_0: Array, w: Array, seq_lengths: Array,
@@ -341,6 +459,23 @@ def lstm_fwd(x: Array, h_0: Array, c_0: Array, w: Array, seq_lengths: Array,
                          reserve_space)
 
 
+@lru_cache(maxsize=128)
+def _rnn_workspace_reserve_space_sizes(input_size: int, hidden_size: int,
+                                       num_layers: int, batch_size: int,
+                                       max_seq_length: int, dropout: float,
+                                       bidirectional: bool) -> Tuple[int, int]:
+  """Cached cuDNN (workspace size, reserve space size) query.
+
+  The sizes are queried on the current device and the cache is not keyed by
+  device, so they are assumed to be the same on every GPU in the process.
+  """
+  # pytype: disable=attribute-error
+  return gpu_rnn.compute_rnn_workspace_reserve_space_sizes(
+      input_size, hidden_size, num_layers, batch_size, max_seq_length, dropout,
+      bidirectional)
+  # pytype: enable=attribute-error
+
+
 def rnn_abstract_eval(x_aval, h_0_aval, c_0_aval, w_aval, seq_lengths_aval,
                       input_size: int, hidden_size: int, num_layers: int,
                       dropout: float, bidirectional: bool):
@@ -348,10 +483,9 @@ def rnn_abstract_eval(x_aval, h_0_aval, c_0_aval, w_aval, seq_lengths_aval,
   num_directions = 2 if bidirectional else 1
   output_shape = (batch_size, max_seq_length, num_directions * hidden_size)
   output_aval = core.ShapedArray(output_shape, x_aval.dtype)
-  workspace_size, reserve_space_size = (
-      gpu_rnn.compute_rnn_workspace_reserve_space_sizes(  # pytype: disable=attribute-error
-          input_size, hidden_size, num_layers, batch_size, max_seq_length,
-          dropout, bidirectional))
+  workspace_size, reserve_space_size = _rnn_workspace_reserve_space_sizes(
+      input_size, hidden_size, num_layers, batch_size, max_seq_length, dropout,
+      bidirectional)
   workspace_aval = core.ShapedArray((workspace_size,), jnp.float32)
   reserve_space_aval = core.ShapedArray((reserve_space_size,), jnp.float32)
   return output_aval, h_0_aval, c_0_aval, workspace_aval, reserve_space_aval
@@ -11,6 +11,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from functools import partial
+
 from absl.testing import absltest
 import numpy as np
 import jax
@@ -23,6 +25,74 @@ from jax._src.config import config
 config.parse_flags_with_absl()
 
 
+def _lstm_naive(x, h_0, c_0, weights, num_layers, bidirectional):
+  """Per-layer, per-gate LSTM used to check `rnn.lstm_ref` on any backend."""
+
+  def lstm_cell(carry, x, *, W_ih, W_hh, b_ih, b_hh):
+    h, c = carry
+    W_ii, W_if, W_ig, W_io = jnp.split(W_ih, 4, axis=0)
+    W_hi, W_hf, W_hg, W_ho = jnp.split(W_hh, 4, axis=0)
+    b_ii, b_if, b_ig, b_io = jnp.split(b_ih, 4, axis=0)
+    b_hi, b_hf, b_hg, b_ho = jnp.split(b_hh, 4, axis=0)
+    i = jax.nn.sigmoid(x @ W_ii.T + b_ii[None] + h @ W_hi.T + b_hi[None])
+    f = jax.nn.sigmoid(x @ W_if.T + b_if[None] + h @ W_hf.T + b_hf[None])
+    g = jnp.tanh(x @ W_ig.T + b_ig[None] + h @ W_hg.T + b_hg[None])
+    o = jax.nn.sigmoid(x @ W_io.T + b_io[None] + h @ W_ho.T + b_ho[None])
+    c = f * c + i * g
+    h = o * jnp.tanh(c)
+    return (h, c), h
+
+  num_directions = 2 if bidirectional else 1
+  W_ih = list(weights.W_ih_first) + list(weights.W_ih_rest)
+  seq_first_y = x.transpose(1, 0, 2)
+  final_h = []
+  final_c = []
+  for l in range(num_layers):
+    ys = []
+    for d in range(num_directions):
+      p = l * num_directions + d
+      cell = partial(lstm_cell, W_ih=W_ih[p], W_hh=weights.W_hh[p],
+                     b_ih=weights.b_ih[p], b_hh=weights.b_hh[p])
+      (h_t, c_t), y = jax.lax.scan(cell, (h_0[p], c_0[p]), seq_first_y,
+                                   reverse=d == 1)
+      ys.append(y)
+      final_h.append(h_t)
+      final_c.append(c_t)
+    # Inputs to next layer are concat'ed from fwd and bwd.
+    seq_first_y = jnp.concatenate(ys, axis=-1)
+  return (seq_first_y.transpose(1, 0, 2), jnp.stack(final_h),
+          jnp.stack(final_c))
+
+
+def _lstm_ref_inputs(num_layers, bidirectional, batch_size=3, seq_len=5,
+                     input_size=4, hidden_size=6):
+  """Returns random (x, h_0, c_0, weights) and `rnn.lstm_ref` bound to them."""
+  num_directions = 2 if bidirectional else 1
+  seq_lengths = jnp.ones((batch_size,), dtype=jnp.int32) * seq_len
+
+  root_key = jax.random.PRNGKey(1)
+  k1, k2, k3, k4 = jax.random.split(root_key, 4)
+  x = jax.random.normal(
+      k1, (batch_size, seq_len, input_size), dtype=jnp.float32)
+  h_0 = jax.random.normal(
+      k2, (num_directions * num_layers, batch_size, hidden_size),
+      dtype=jnp.float32)
+  c_0 = jax.random.normal(
+      k3, (num_directions * num_layers, batch_size, hidden_size),
+      dtype=jnp.float32)
+  weights = rnn.init_lstm_weight_unpacked(k4, input_size, hidden_size,
+                                          num_layers, bidirectional)
+  f = partial(
+      rnn.lstm_ref,
+      seq_lengths=seq_lengths,
+      input_size=input_size,
+      hidden_size=hidden_size,
+      num_layers=num_layers,
+      dropout=False,
+      bidirectional=bidirectional)
+  return (x, h_0, c_0, weights), f
+
+
 class RnnTest(jtu.JaxTestCase):
 
   @jtu.sample_product(
@@ -74,17 +144,14 @@ class RnnTest(jtu.JaxTestCase):
     y, h_n, c_n = f(x, h_0, c_0, weights)
     jtu.check_grads(f, (x, h_0, c_0, weights), modes=['rev'], order=1)
 
-    W_ih, W_hh, b_ih, b_hh = rnn.unpack_lstm_weights(weights, input_size,
-                                                     hidden_size, num_layers,
-                                                     bidirectional)
+    unpacked_weights = rnn.unpack_lstm_weights(weights, input_size,
+                                               hidden_size, num_layers,
+                                               bidirectional)
     y_ref, h_n_ref, c_n_ref = rnn.lstm_ref(
         x,
         h_0,
         c_0,
-        W_ih,
-        W_hh,
-        b_ih,
-        b_hh,
+        unpacked_weights,
         seq_lengths=seq_lengths,
         input_size=input_size,
         hidden_size=hidden_size,
@@ -96,6 +163,71 @@ class RnnTest(jtu.JaxTestCase):
     np.testing.assert_allclose(h_n_ref, h_n, rtol=1e-05, atol=1e-5)
     np.testing.assert_allclose(c_n_ref, c_n, rtol=1e-05, atol=1e-5)
 
+  @jtu.sample_product(num_layers=[1, 2, 3], bidirectional=[True, False])
+  def test_lstm_ref(self, num_layers: int, bidirectional: bool):
+    args, f = _lstm_ref_inputs(num_layers, bidirectional)
+    y, h_n, c_n = f(*args)
+    y_ref, h_n_ref, c_n_ref = _lstm_naive(*args, num_layers, bidirectional)
+
+    np.testing.assert_allclose(y_ref, y, rtol=1e-05, atol=1e-5)
+    np.testing.assert_allclose(h_n_ref, h_n, rtol=1e-05, atol=1e-5)
+    np.testing.assert_allclose(c_n_ref, c_n, rtol=1e-05, atol=1e-5)
+
+  @jtu.sample_product(num_layers=[1, 3], bidirectional=[True, False])
+  def test_lstm_ref_grad(self, num_layers: int, bidirectional: bool):
+    args, f = _lstm_ref_inputs(num_layers, bidirectional)
+    f_ref = partial(_lstm_naive, num_layers=num_layers,
+                    bidirectional=bidirectional)
+
+    def loss(f):
+      return lambda *args: sum(jnp.sum(jnp.sin(out)) for out in f(*args))
+
+    grads = jax.grad(loss(f), argnums=(0, 1, 2, 3))(*args)
+    grads_ref = jax.grad(loss(f_ref), argnums=(0, 1, 2, 3))(*args)
+    self.assertAllClose(grads, grads_ref, rtol=1e-5, atol=1e-5)
+    jtu.check_grads(f, args, modes=['rev'], order=1)
+
+  @jtu.sample_product(bidirectional=[True, False])
+  def test_lstm_ref_compute_dtype(self, bidirectional: bool):
+    args, f = _lstm_ref_inputs(3, bidirectional, batch_size=6, seq_len=7,
+                               input_size=8, hidden_size=12)
+    y, h_n, c_n = f(*args)
+    y_bf16, h_n_bf16, c_n_bf16 = f(*args, compute_dtype=jnp.bfloat16)
+
+    self.assertEqual(y_bf16.dtype, jnp.float32)
+    self.assertEqual(h_n_bf16.dtype, jnp.float32)
+    self.assertEqual(c_n_bf16.dtype, jnp.float32)
+    np.testing.assert_allclose(y_bf16, y, rtol=5e-2, atol=5e-2)
+    np.testing.assert_allclose(h_n_bf16, h_n, rtol=5e-2, atol=5e-2)
+    np.testing.assert_allclose(c_n_bf16, c_n, rtol=5e-2, atol=5e-2)
+
+  @jtu.sample_product(num_layers=[1, 3], bidirectional=[True, False])
+  def test_pack_unpack_lstm_weights(self, num_layers: int,
+                                    bidirectional: bool):
+    input_size = 8
+    hidden_size = 12
+    key = jax.random.PRNGKey(1)
+    weights = rnn.init_lstm_weight(key, input_size, hidden_size, num_layers,
+                                   bidirectional)
+    unpacked_weights = rnn.unpack_lstm_weights(weights, input_size,
+                                               hidden_size, num_layers,
+                                               bidirectional)
+    self.assertArraysEqual(rnn.pack_lstm_weights(unpacked_weights), weights)
+
+    init_weights = rnn.init_lstm_weight_unpacked(key, input_size, hidden_size,
+                                                 num_layers, bidirectional)
+    self.assertEqual(
+        jax.tree_util.tree_map(jnp.shape, init_weights),
+        jax.tree_util.tree_map(jnp.shape, unpacked_weights))
+    k = np.sqrt(1.0 / hidden_size)
+    for w in init_weights:
+      self.assertTrue(np.all(np.abs(w) <= k))
+    # Each stack is drawn from its own key, so no two of them coincide.
+    heads = [np.ravel(w)[:4 * hidden_size] for w in init_weights if w.size]
+    for i in range(len(heads)):
+      for j in range(i):
+        self.assertFalse(np.allclose(heads[i], heads[j]))
+
 
 if __name__ == '__main__':
   absltest.main(testLoader=jtu.JaxTestLoader())